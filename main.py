@@ -6,22 +6,23 @@
 import sys
 import os
 from pathlib import Path
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
 import logging
 
 # 添加项目根目录到Python路径
-project_root = Path(__file__).parent
-sys.path.insert(0, str(project_root))
+# 已在sys.path中时不再重复加入（直接运行或经start.py启动时均已存在）
+project_root = Path(__file__).resolve().parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
 
 from core.base import BaseConfig, AppCore, ModuleManager, ModuleType, initialize_app, cleanup_app
-from modules.data_collection import DataCollectionModule
-from modules.ai_analysis import AIAnalysisModule
-from modules.recommendation_engine import RecommendationEngine
-from modules.ocr_calorie_recognition import OCRCalorieRecognitionModule
-from gui.main_window import MainWindow
 import tkinter as tk
 from tkinter import messagebox
 
+# 各功能模块与GUI依赖较重，在实际注册/启动时才导入，导入本模块本身保持轻量
+if TYPE_CHECKING:
+    from gui.main_window import MainWindow
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -41,7 +42,7 @@ class DietRecommendationApp:
     def __init__(self):
         self.config = self._load_config()
         self.app_core: Optional[AppCore] = None
-        self.main_window: Optional[MainWindow] = None
+        self.main_window: Optional["MainWindow"] = None
         self.is_running = False
     
     def _load_config(self) -> BaseConfig:
@@ -104,6 +105,11 @@ class DietRecommendationApp:
     def _register_modules(self) -> bool:
         """注册所有模块"""
         try:
+            from modules.data_collection import DataCollectionModule
+            from modules.ai_analysis import AIAnalysisModule
+            from modules.recommendation_engine import RecommendationEngine
+            from modules.ocr_calorie_recognition import OCRCalorieRecognitionModule
+            
             module_manager = ModuleManager(self.config)
             
             # 注册数据采集模块
@@ -140,6 +146,10 @@ class DietRecommendationApp:
             logger.info("所有模块注册成功")
             return True
             
+        except ImportError as e:
+            # 功能模块依赖的第三方包缺失时，明确告知用户缺少哪个包
+            logger.error(f"模块注册失败，缺少依赖包: {e.name or e}，请先安装后再启动")
+            return False
         except Exception as e:
             logger.error(f"模块注册失败: {e}")
             return False
@@ -7,8 +7,16 @@ import cv2
 import numpy as np
 import re
 import json
+import functools
+import importlib.util
+import heapq
 import logging
-from typing import Dict, List, Optional, Any, Tuple
+import os
+import pickle
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Any, Tuple, Set, Union
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
@@ -18,8 +26,53 @@ from PIL import Image, ImageEnhance, ImageFilter
 import pytesseract
 from core.base import BaseModule, ModuleType, UserData, AnalysisResult, BaseConfig
 
+try:
+    # 可选依赖：orjson解析/序列化速度明显快于标准库json
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+# 食物名称索引的n-gram长度（中文食物名较短，短于该长度的名称以全名建索引）
+FOOD_NGRAM_SIZE = 3
+
+# 模糊匹配结果缓存的容量
+DATABASE_MATCH_CACHE_SIZE = 4096
+
+# 预处理时图片长边的上限（像素），超过则先等比缩小
+MAX_IMAGE_SIDE = 1600
+
+# 二值图前景占比在该区间内视为对比度良好，跳过闭运算
+CLEAN_BINARY_RATIO_RANGE = (0.15, 0.85)
+
+# 食物名称在热量数值前后的查找范围（字符数）
+FOOD_NAME_CONTEXT_CHARS = 50
+
+# 用户修正数据：快照文件 + 追加日志，日志超过该行数时合并回快照
+USER_CORRECTIONS_FILE = Path("data/user_corrections.json")
+USER_CORRECTIONS_LOG_FILE = Path("data/user_corrections.log")
+CORRECTIONS_LOG_COMPACT_LINES = 1000
+
+# 扩展食物数据库及其pickle快照（快照不旧于JSON时优先读取）
+FOOD_DATABASE_FILE = Path("data/food_database.json")
+FOOD_DATABASE_CACHE_FILE = Path("data/food_database.pkl")
+
+
+def _json_loads(data: Union[str, bytes]) -> Any:
+    """解析JSON，优先使用orjson"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _json_dumps(obj: Any, indent: bool = False) -> bytes:
+    """序列化为UTF-8编码的JSON（保留非ASCII字符），优先使用orjson"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, option=option)
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None).encode('utf-8')
+
 
 @dataclass
 class OCRResult:
@@ -65,30 +118,33 @@ class OCRCalorieRecognitionModule(BaseModule):
         self.min_confidence = 0.6
         self.max_processing_time = 30.0
         
-        # 热量识别模式
-        self.calorie_patterns = [
-            r'(\d+(?:\.\d+)?)\s*[kK]?[cC][aA][lL](?:ories?)?',
-            r'(\d+(?:\.\d+)?)\s*[kK][cC][aA][lL]',
-            r'(\d+(?:\.\d+)?)\s*卡路里',
-            r'(\d+(?:\.\d+)?)\s*千卡',
-            r'(\d+(?:\.\d+)?)\s*大卡',
-            r'(\d+(?:\.\d+)?)\s*[kK][jJ]',  # 千焦
-        ]
+        # 图像预处理
+        self._clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+        self._close_kernel = np.ones((2, 2), dtype=np.uint8)  # 即2x2矩形结构元素
+        self._gpu_filters = self._create_gpu_filters()
+        self._use_gpu_cv = self._gpu_filters is not None
         
-        # 食物名称模式
-        self.food_patterns = [
-            r'([a-zA-Z\u4e00-\u9fff]+)\s*(?:\d+(?:\.\d+)?)',
-            r'(\d+(?:\.\d+)?)\s*([a-zA-Z\u4e00-\u9fff]+)',
-        ]
+        # 热量与食物名称的统一词法模式：数值（可带热量单位）或食物名称，一次扫描全文
+        self._token_re = re.compile(
+            r'(?P<num>\d+(?:\.\d+)?)\s*(?P<unit>k?cal(?:ories?)?|kj|卡路里|千卡|大卡)?'  # kj为千焦
+            r'|(?P<word>[a-zA-Z\u4e00-\u9fff]{2,20})',
+            re.IGNORECASE
+        )
         
         # 食物数据库
         self.food_database = self._load_food_database()
+        self._food_ngram_index = self._build_food_ngram_index(self.food_database)
+        # 模糊匹配结果缓存，随数据库一同重建
+        self._fuzzy_match_cache = functools.lru_cache(maxsize=DATABASE_MATCH_CACHE_SIZE)(self._fuzzy_database_match)
         
         # 用户学习数据
         self.user_corrections = {}
+        self._corrections_log = None
+        self._corrections_log_lines = 0
         
         # 初始化OCR引擎
         self.ocr_engines = {}
+        self._ocr_dispatch = {}
         self._initialize_ocr_engines()
     
     def initialize(self) -> bool:
@@ -101,6 +157,7 @@ class OCRCalorieRecognitionModule(BaseModule):
             
             # 加载用户学习数据
             self._load_user_corrections()
+            self._open_corrections_log()
             
             self.is_initialized = True
             self.logger.info("OCR热量识别模块初始化完成")
@@ -136,7 +193,7 @@ class OCRCalorieRecognitionModule(BaseModule):
     
     def _recognize_image_calories(self, input_data: Dict[str, Any], user_data: UserData) -> Dict[str, Any]:
         """识别图片中的热量信息"""
-        start_time = datetime.now()
+        start_time = time.perf_counter()
         
         try:
             image_path = input_data.get('image_path')
@@ -145,12 +202,17 @@ class OCRCalorieRecognitionModule(BaseModule):
             
             # 预处理图片
             processed_image = self._preprocess_image(image_path)
+            if processed_image is None:
+                return self._create_error_result("无法读取图片")
+            
+            # 各引擎所需的图像格式只准备一次
+            ocr_inputs = self._prepare_ocr_inputs(processed_image)
             
             # 多OCR引擎识别
             ocr_results = []
             for method in self.ocr_methods:
                 try:
-                    result = self._ocr_recognize(processed_image, method)
+                    result = self._ocr_recognize(ocr_inputs[method], method)
                     if result:
                         ocr_results.append(result)
                 except Exception as e:
@@ -168,7 +230,7 @@ class OCRCalorieRecognitionModule(BaseModule):
             # 生成建议
             suggestions = self._generate_suggestions(validated_infos, user_data)
             
-            processing_time = (datetime.now() - start_time).total_seconds()
+            processing_time = time.perf_counter() - start_time
             
             result = FoodRecognitionResult(
                 image_path=image_path,
@@ -201,69 +263,148 @@ class OCRCalorieRecognitionModule(BaseModule):
             # 转换为灰度图
             gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
             
-            # 降噪
-            denoised = cv2.medianBlur(gray, 3)
-            
-            # 增强对比度
-            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-            enhanced = clahe.apply(denoised)
-            
-            # 二值化
-            _, binary = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+            # 高分辨率图片先缩小，后续每一步处理的像素量随之减少
+            height, width = gray.shape
+            scale = MAX_IMAGE_SIDE / max(height, width)
+            if scale < 1:
+                gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
             
-            # 形态学操作
-            kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2, 2))
-            cleaned = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
+            if self._use_gpu_cv:
+                try:
+                    return self._preprocess_gray_gpu(gray)
+                except Exception as e:
+                    self.logger.warning(f"GPU图片预处理失败，回退到CPU: {e}")
             
-            return cleaned
+            return self._preprocess_gray_cpu(gray)
             
         except Exception as e:
             self.logger.error(f"图片预处理失败: {e}")
             return cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
     
-    def _ocr_recognize(self, image: np.ndarray, method: str) -> Optional[OCRResult]:
-        """使用指定方法进行OCR识别"""
-        start_time = datetime.now()
+    def _preprocess_gray_cpu(self, gray: np.ndarray) -> np.ndarray:
+        """在CPU上对灰度图降噪、增强对比度并二值化"""
+        # 后续步骤在两块缓冲区间交替输出，避免每步分配新图像
+        buffer = np.empty_like(gray)
         
-        try:
-            if method == 'tesseract':
-                return self._tesseract_ocr(image)
-            elif method == 'paddleocr':
-                return self._paddleocr_recognize(image)
-            elif method == 'easyocr':
-                return self._easyocr_recognize(image)
-            else:
-                return None
-                
-        except Exception as e:
-            self.logger.error(f"OCR方法 {method} 失败: {e}")
-            return None
+        # 降噪
+        cv2.medianBlur(gray, 3, dst=buffer)
+        
+        # 增强对比度
+        self._clahe.apply(buffer, gray)
+        
+        # 二值化
+        cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=buffer)
+        
+        # 形态学操作（对比度良好的图片无需闭运算）
+        if self._is_clean_binary(cv2.countNonZero(buffer), buffer.size):
+            return buffer
+        cv2.morphologyEx(buffer, cv2.MORPH_CLOSE, self._close_kernel, dst=gray)
+        
+        return gray
+    
+    def _preprocess_gray_gpu(self, gray: np.ndarray) -> np.ndarray:
+        """在GPU上执行与CPU相同的预处理流程，只上传和下载各一次"""
+        filters = self._gpu_filters
+        
+        gpu_image = cv2.cuda_GpuMat()
+        gpu_image.upload(gray)
+        
+        # 降噪 + 增强对比度
+        gpu_image = filters['median'].apply(gpu_image)
+        gpu_image = filters['clahe'].apply(gpu_image, cv2.cuda_Stream.Null())
+        
+        # cv2.cuda.threshold不支持OTSU，由直方图在CPU上求阈值
+        hist = cv2.cuda.calcHist(gpu_image).download().ravel()
+        _, gpu_image = cv2.cuda.threshold(gpu_image, self._otsu_threshold(hist), 255, cv2.THRESH_BINARY)
+        
+        # 形态学操作（对比度良好的图片无需闭运算）
+        if not self._is_clean_binary(cv2.cuda.countNonZero(gpu_image), gray.size):
+            gpu_image = filters['close'].apply(gpu_image)
+        
+        return gpu_image.download()
     
-    def _tesseract_ocr(self, image: np.ndarray) -> OCRResult:
+    @staticmethod
+    def _is_clean_binary(foreground_pixels: int, total_pixels: int) -> bool:
+        """二值图前景占比是否处于对比度良好的区间"""
+        low, high = CLEAN_BINARY_RATIO_RANGE
+        return low < foreground_pixels / total_pixels < high
+    
+    @staticmethod
+    def _otsu_threshold(hist: np.ndarray) -> float:
+        """根据256级灰度直方图计算Otsu阈值"""
+        hist = hist.astype(np.float64)
+        levels = np.arange(hist.size, dtype=np.float64)
+        
+        weight_bg = np.cumsum(hist)
+        weight_fg = weight_bg[-1] - weight_bg
+        sum_bg = np.cumsum(hist * levels)
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_bg = sum_bg / weight_bg
+            mean_fg = (sum_bg[-1] - sum_bg) / weight_fg
+            between_var = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+        
+        return float(np.argmax(np.nan_to_num(between_var)))
+    
+    def _prepare_ocr_inputs(self, image: np.ndarray) -> Dict[str, Any]:
+        """为各OCR引擎准备输入图像，引擎之间共享同一块灰度缓冲区"""
+        gray = np.ascontiguousarray(image, dtype=np.uint8)
+        
+        inputs = {method: gray for method in self.ocr_methods}
+        
+        # Tesseract：直接引用灰度缓冲区的PIL视图，省去ndarray到PIL的拷贝
+        if 'tesseract' in inputs:
+            height, width = gray.shape[:2]
+            inputs['tesseract'] = Image.frombuffer('L', (width, height), gray, 'raw', 'L', 0, 1)
+        
+        # PaddleOCR需要三通道BGR图像
+        if 'paddleocr' in inputs:
+            inputs['paddleocr'] = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+        
+        return inputs
+    
+    def _ocr_recognize(self, image: Union[np.ndarray, Image.Image], method: str) -> Optional[OCRResult]:
+        """使用指定方法进行OCR识别"""
+        recognize = self._ocr_dispatch.get(method)
+        return recognize(image) if recognize else None
+    
+    def _tesseract_ocr(self, image: Union[np.ndarray, Image.Image]) -> OCRResult:
         """使用Tesseract进行OCR识别"""
+        start_time = time.perf_counter()
+        
         try:
             # 配置Tesseract
             config = '--oem 3 --psm 6 -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz\u4e00-\u9fff'
             
-            # OCR识别
-            text = pytesseract.image_to_string(image, config=config, lang='chi_sim+eng')
-            
-            # 获取置信度
+            # OCR识别（image_to_data已包含全部词元，无需再调用image_to_string）
             data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT, config=config, lang='chi_sim+eng')
-            confidences = [int(conf) for conf in data['conf'] if int(conf) > 0]
-            avg_confidence = sum(confidences) / len(confidences) / 100.0 if confidences else 0.0
             
-            # 获取边界框
+            # 获取边界框、置信度，并按行重建文本
             bounding_boxes = []
+            confidences = []
+            lines = []
+            current_line = None
             for i in range(len(data['text'])):
-                if int(data['conf'][i]) > 0:
-                    bounding_boxes.append({
-                        'text': data['text'][i],
-                        'confidence': int(data['conf'][i]) / 100.0,
-                        'bbox': [data['left'][i], data['top'][i], data['width'][i], data['height'][i]]
-                    })
+                conf = float(data['conf'][i])
+                if conf <= 0:
+                    continue
+                word = data['text'][i]
+                confidences.append(conf)
+                bounding_boxes.append({
+                    'text': word,
+                    'confidence': conf / 100.0,
+                    'bbox': [data['left'][i], data['top'][i], data['width'][i], data['height'][i]]
+                })
+                line_key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+                if line_key != current_line:
+                    lines.append([])
+                    current_line = line_key
+                lines[-1].append(word)
+            
+            text = '\n'.join(' '.join(words) for words in lines)
+            avg_confidence = float(np.mean(confidences)) / 100.0 if confidences else 0.0
             
-            processing_time = (datetime.now() - datetime.now()).total_seconds()
+            processing_time = time.perf_counter() - start_time
             
             return OCRResult(
                 text=text.strip(),
@@ -279,6 +420,8 @@ class OCRCalorieRecognitionModule(BaseModule):
     
     def _paddleocr_recognize(self, image: np.ndarray) -> Optional[OCRResult]:
         """使用PaddleOCR进行识别"""
+        start_time = time.perf_counter()
+        
         try:
             # 这里需要安装paddleocr: pip install paddleocr
             from paddleocr import PaddleOCR
@@ -309,13 +452,13 @@ class OCRCalorieRecognitionModule(BaseModule):
                     })
             
             merged_text = ' '.join(texts)
-            avg_confidence = sum(confidences) / len(confidences) if confidences else 0.0
+            avg_confidence = float(np.mean(confidences)) if confidences else 0.0
             
             return OCRResult(
                 text=merged_text,
                 confidence=avg_confidence,
                 bounding_boxes=bounding_boxes,
-                processing_time=0.0,
+                processing_time=time.perf_counter() - start_time,
                 method='paddleocr'
             )
             
@@ -328,6 +471,8 @@ class OCRCalorieRecognitionModule(BaseModule):
     
     def _easyocr_recognize(self, image: np.ndarray) -> Optional[OCRResult]:
         """使用EasyOCR进行识别"""
+        start_time = time.perf_counter()
+        
         try:
             # 这里需要安装easyocr: pip install easyocr
             import easyocr
@@ -356,13 +501,13 @@ class OCRCalorieRecognitionModule(BaseModule):
                 })
             
             merged_text = ' '.join(texts)
-            avg_confidence = sum(confidences) / len(confidences) if confidences else 0.0
+            avg_confidence = float(np.mean(confidences)) if confidences else 0.0
             
             return OCRResult(
                 text=merged_text,
                 confidence=avg_confidence,
                 bounding_boxes=bounding_boxes,
-                processing_time=0.0,
+                processing_time=time.perf_counter() - start_time,
                 method='easyocr'
             )
             
@@ -378,16 +523,16 @@ class OCRCalorieRecognitionModule(BaseModule):
         if not ocr_results:
             return ""
         
-        # 按置信度排序
-        sorted_results = sorted(ocr_results, key=lambda x: x.confidence, reverse=True)
+        # 只需置信度最高的前3个结果
+        top_results = heapq.nlargest(3, ocr_results, key=lambda x: x.confidence)
         
         # 使用最高置信度的结果作为主要结果
-        primary_result = sorted_results[0]
+        primary_result = top_results[0]
         
         # 如果有多个高置信度结果，尝试合并
-        if len(sorted_results) > 1 and sorted_results[1].confidence > 0.7:
+        if len(top_results) > 1 and top_results[1].confidence > 0.7:
             # 简单的文本合并策略
-            merged_text = self._smart_text_merge([r.text for r in sorted_results[:3]])
+            merged_text = self._smart_text_merge([r.text for r in top_results])
             return merged_text
         
         return primary_result.text
@@ -400,39 +545,57 @@ class OCRCalorieRecognitionModule(BaseModule):
         if len(texts) == 1:
             return texts[0]
         
-        # 简单的合并策略：选择最长的文本
-        return max(texts, key=len)
+        # 简单的合并策略：去重后选择最长的文本
+        unique_texts = list(dict.fromkeys(texts))
+        return max(unique_texts, key=len)
     
     def _extract_calorie_info(self, text: str, user_data: UserData) -> List[CalorieInfo]:
-        """从文本中提取热量信息"""
+        """从文本中提取热量信息
+
+        热量数值优先匹配其前方最近的食物名称，其次匹配其后最近的名称，
+        均需位于FOOD_NAME_CONTEXT_CHARS范围内。
+        """
         calorie_infos = []
+        food_names = []
+        last_word = None  # (位置, 名称)
+        pending = []  # 等待后方食物名称的 (位置, CalorieInfo)
         
         try:
-            # 查找热量数值
-            for pattern in self.calorie_patterns:
-                matches = re.finditer(pattern, text, re.IGNORECASE)
-                for match in matches:
-                    calories = float(match.group(1))
-                    
-                    # 查找对应的食物名称
-                    food_name = self._extract_food_name(text, match.start())
-                    
-                    calorie_info = CalorieInfo(
-                        food_name=food_name,
-                        calories=calories,
-                        serving_size=None,
-                        confidence=0.8,  # OCR基础置信度
-                        source='ocr',
-                        raw_text=match.group(0),
-                        validation_status='pending'
-                    )
-                    
-                    calorie_infos.append(calorie_info)
+            for match in self._token_re.finditer(text):
+                word = match.group('word')
+                if word:
+                    for position, info in pending:
+                        if match.start() < position + FOOD_NAME_CONTEXT_CHARS:
+                            info.food_name = word
+                    pending.clear()
+                    food_names.append(word)
+                    last_word = (match.start(), word)
+                    continue
+                
+                # 不带热量单位的数值忽略
+                if not match.group('unit'):
+                    continue
+                
+                calorie_info = CalorieInfo(
+                    food_name="未知食物",
+                    calories=float(match.group('num')),
+                    serving_size=None,
+                    confidence=0.8,  # OCR基础置信度
+                    source='ocr',
+                    raw_text=match.group(0),
+                    validation_status='pending'
+                )
+                
+                if last_word and last_word[0] >= match.start() - FOOD_NAME_CONTEXT_CHARS:
+                    calorie_info.food_name = last_word[1]
+                else:
+                    pending.append((match.start(), calorie_info))
+                
+                calorie_infos.append(calorie_info)
             
-            # 如果没有找到热量信息，尝试查找食物名称
+            # 如果没有找到热量信息，使用识别到的食物名称（去重，最多5个）
             if not calorie_infos:
-                food_names = self._extract_all_food_names(text)
-                for food_name in food_names:
+                for food_name in list(dict.fromkeys(food_names))[:5]:
                     calorie_info = CalorieInfo(
                         food_name=food_name,
                         calories=None,
@@ -450,42 +613,6 @@ class OCRCalorieRecognitionModule(BaseModule):
             self.logger.error(f"热量信息提取失败: {e}")
             return []
     
-    def _extract_food_name(self, text: str, calorie_position: int) -> str:
-        """提取食物名称"""
-        try:
-            # 在热量数值前后查找食物名称
-            context_start = max(0, calorie_position - 50)
-            context_end = min(len(text), calorie_position + 50)
-            context = text[context_start:context_end]
-            
-            # 查找中文和英文食物名称
-            food_pattern = r'([a-zA-Z\u4e00-\u9fff]{2,20})'
-            matches = re.findall(food_pattern, context)
-            
-            if matches:
-                # 选择最可能的食物名称
-                return matches[0]
-            
-            return "未知食物"
-            
-        except Exception as e:
-            self.logger.error(f"食物名称提取失败: {e}")
-            return "未知食物"
-    
-    def _extract_all_food_names(self, text: str) -> List[str]:
-        """提取所有可能的食物名称"""
-        try:
-            food_pattern = r'([a-zA-Z\u4e00-\u9fff]{2,20})'
-            matches = re.findall(food_pattern, text)
-            
-            # 去重并过滤
-            unique_foods = list(set(matches))
-            return unique_foods[:5]  # 最多返回5个
-            
-        except Exception as e:
-            self.logger.error(f"食物名称提取失败: {e}")
-            return []
-    
     def _validate_with_database(self, calorie_infos: List[CalorieInfo], user_data: UserData) -> List[CalorieInfo]:
         """使用数据库验证热量信息"""
         validated_infos = []
@@ -525,16 +652,36 @@ class OCRCalorieRecognitionModule(BaseModule):
                 return self.food_database[food_name]
             
             # 模糊匹配
-            for db_food, info in self.food_database.items():
-                if food_name in db_food or db_food in food_name:
-                    return info
-            
-            return None
+            return self._fuzzy_match_cache(food_name)
             
         except Exception as e:
             self.logger.error(f"数据库匹配失败: {e}")
             return None
     
+    def _fuzzy_database_match(self, food_name: str) -> Optional[Dict[str, Any]]:
+        """按n-gram重合度排序候选，再校验包含关系"""
+        if not food_name:
+            return None
+        
+        size = min(FOOD_NGRAM_SIZE, len(food_name))
+        grams = {food_name[i:i + size] for i in range(len(food_name) - size + 1)}
+        candidates = Counter()
+        for gram in grams:
+            candidates.update(self._food_ngram_index.get(gram, ()))
+        
+        for db_food, _ in candidates.most_common():
+            if food_name in db_food or db_food in food_name:
+                return self.food_database[db_food]
+        
+        # 比查询n-gram更短的数据库名称只可能作为子串出现
+        for length in range(size - 1, 0, -1):
+            for i in range(len(food_name) - length + 1):
+                info = self.food_database.get(food_name[i:i + length])
+                if info is not None:
+                    return info
+        
+        return None
+    
     def _get_user_correction(self, user_id: str, food_name: str) -> Optional[Dict[str, Any]]:
         """获取用户修正数据"""
         try:
@@ -573,13 +720,17 @@ class OCRCalorieRecognitionModule(BaseModule):
                 return 0.0
             
             # OCR置信度
-            ocr_confidence = sum(r.confidence for r in ocr_results) / len(ocr_results) if ocr_results else 0.0
+            ocr_confidence = np.fromiter(
+                (r.confidence for r in ocr_results), dtype=np.float64, count=len(ocr_results)
+            ).mean() if ocr_results else 0.0
             
             # 热量信息置信度
-            calorie_confidence = sum(info.confidence for info in calorie_infos) / len(calorie_infos) if calorie_infos else 0.0
+            calorie_confidence = np.fromiter(
+                (info.confidence for info in calorie_infos), dtype=np.float64, count=len(calorie_infos)
+            ).mean() if calorie_infos else 0.0
             
             # 综合置信度
-            overall_confidence = (ocr_confidence * 0.4 + calorie_confidence * 0.6)
+            overall_confidence = float(ocr_confidence * 0.4 + calorie_confidence * 0.6)
             
             return min(overall_confidence, 1.0)
             
@@ -633,14 +784,24 @@ class OCRCalorieRecognitionModule(BaseModule):
             if user_id not in self.user_corrections:
                 self.user_corrections[user_id] = {}
             
-            self.user_corrections[user_id][food_name] = {
+            entry = {
                 'calories': calories,
                 'timestamp': datetime.now().isoformat(),
                 'correction_count': self.user_corrections[user_id].get(food_name, {}).get('correction_count', 0) + 1
             }
+            self.user_corrections[user_id][food_name] = entry
+            
+            # 追加到日志；日志未打开时直接写快照
+            if self._corrections_log is None:
+                self._save_user_corrections_to_file()
+                return
             
-            # 保存到文件
-            self._save_user_corrections_to_file()
+            record = {'user_id': user_id, 'food_name': food_name, **entry}
+            self._corrections_log.write(_json_dumps(record).decode('utf-8') + '\n')
+            self._corrections_log_lines += 1
+            
+            if self._corrections_log_lines >= CORRECTIONS_LOG_COMPACT_LINES:
+                self._compact_corrections_log()
             
         except Exception as e:
             self.logger.error(f"保存用户修正数据失败: {e}")
@@ -678,18 +839,48 @@ class OCRCalorieRecognitionModule(BaseModule):
             }
             
             # 尝试从文件加载扩展数据库
-            db_file = Path("data/food_database.json")
-            if db_file.exists():
-                with open(db_file, 'r', encoding='utf-8') as f:
-                    extended_db = json.load(f)
-                    food_db.update(extended_db)
+            if FOOD_DATABASE_FILE.exists():
+                food_db.update(self._load_extended_food_database())
             
-            return food_db
+            # 驻留名称字符串，n-gram索引与数据库共享同一对象
+            return {sys.intern(name): info for name, info in food_db.items()}
             
         except Exception as e:
             self.logger.error(f"加载食物数据库失败: {e}")
             return {}
     
+    def _load_extended_food_database(self) -> Dict[str, Dict[str, Any]]:
+        """加载扩展食物数据库，优先使用pickle快照"""
+        try:
+            if (FOOD_DATABASE_CACHE_FILE.exists() and
+                    FOOD_DATABASE_CACHE_FILE.stat().st_mtime >= FOOD_DATABASE_FILE.stat().st_mtime):
+                with open(FOOD_DATABASE_CACHE_FILE, 'rb') as f:
+                    return pickle.load(f)
+        except Exception as e:
+            self.logger.warning(f"读取食物数据库快照失败，改为解析JSON: {e}")
+        
+        extended_db = _json_loads(FOOD_DATABASE_FILE.read_bytes())
+        
+        try:
+            tmp_file = FOOD_DATABASE_CACHE_FILE.with_suffix('.pkl.tmp')
+            with open(tmp_file, 'wb') as f:
+                pickle.dump(extended_db, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, FOOD_DATABASE_CACHE_FILE)
+        except Exception as e:
+            self.logger.warning(f"写入食物数据库快照失败: {e}")
+        
+        return extended_db
+    
+    def _build_food_ngram_index(self, food_db: Dict[str, Dict[str, Any]]) -> Dict[str, Set[str]]:
+        """构建食物名称的n-gram倒排索引"""
+        index = defaultdict(set)
+        for name in food_db:
+            # 索引所有不超过FOOD_NGRAM_SIZE的子串，使较短的查询也能命中
+            for size in range(1, min(FOOD_NGRAM_SIZE, len(name)) + 1):
+                for i in range(len(name) - size + 1):
+                    index[name[i:i + size]].add(name)
+        return dict(index)
+    
     def _create_directories(self):
         """创建必要的目录"""
         directories = [
@@ -702,38 +893,120 @@ class OCRCalorieRecognitionModule(BaseModule):
             Path(directory).mkdir(parents=True, exist_ok=True)
     
     def _load_user_corrections(self):
-        """加载用户修正数据"""
+        """加载用户修正数据（快照 + 追加日志）"""
         try:
-            corrections_file = Path("data/user_corrections.json")
-            if corrections_file.exists():
-                with open(corrections_file, 'r', encoding='utf-8') as f:
-                    self.user_corrections = json.load(f)
+            if USER_CORRECTIONS_FILE.exists():
+                self.user_corrections = _json_loads(USER_CORRECTIONS_FILE.read_bytes())
             else:
                 self.user_corrections = {}
         except Exception as e:
             self.logger.error(f"加载用户修正数据失败: {e}")
             self.user_corrections = {}
+        
+        self._replay_corrections_log()
     
-    def _save_user_corrections_to_file(self):
-        """保存用户修正数据到文件"""
+    def _replay_corrections_log(self):
+        """将快照之后追加的修正日志重放到内存"""
+        self._corrections_log_lines = 0
+        if not USER_CORRECTIONS_LOG_FILE.exists():
+            return
+        
         try:
-            corrections_file = Path("data/user_corrections.json")
-            with open(corrections_file, 'w', encoding='utf-8') as f:
-                json.dump(self.user_corrections, f, ensure_ascii=False, indent=2)
+            with open(USER_CORRECTIONS_LOG_FILE, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = _json_loads(line)
+                    except ValueError:
+                        # 进程中断时最后一行可能不完整
+                        continue
+                    user_id = record.pop('user_id')
+                    food_name = record.pop('food_name')
+                    self.user_corrections.setdefault(user_id, {})[food_name] = record
+                    self._corrections_log_lines += 1
+        except Exception as e:
+            self.logger.error(f"重放用户修正日志失败: {e}")
+    
+    def _open_corrections_log(self):
+        """以追加模式打开用户修正日志"""
+        try:
+            if self._corrections_log is None:
+                USER_CORRECTIONS_LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
+                self._corrections_log = open(USER_CORRECTIONS_LOG_FILE, 'a', encoding='utf-8', buffering=1)
+        except Exception as e:
+            self.logger.error(f"打开用户修正日志失败: {e}")
+            self._corrections_log = None
+    
+    def _compact_corrections_log(self):
+        """将修正日志合并进快照文件并清空日志"""
+        if not self._save_user_corrections_to_file():
+            return
+        
+        try:
+            if self._corrections_log is not None:
+                self._corrections_log.seek(0)
+                self._corrections_log.truncate()
+            elif USER_CORRECTIONS_LOG_FILE.exists():
+                USER_CORRECTIONS_LOG_FILE.unlink()
+            self._corrections_log_lines = 0
+        except Exception as e:
+            self.logger.error(f"清空用户修正日志失败: {e}")
+    
+    def _save_user_corrections_to_file(self) -> bool:
+        """原子地保存用户修正数据快照"""
+        try:
+            USER_CORRECTIONS_FILE.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = USER_CORRECTIONS_FILE.with_suffix('.json.tmp')
+            tmp_file.write_bytes(_json_dumps(self.user_corrections, indent=True))
+            os.replace(tmp_file, USER_CORRECTIONS_FILE)
+            return True
         except Exception as e:
             self.logger.error(f"保存用户修正数据失败: {e}")
+            return False
+    
+    def _create_gpu_filters(self) -> Optional[Dict[str, Any]]:
+        """检测OpenCV CUDA支持并创建GPU预处理滤波器，不可用时返回None"""
+        try:
+            if not hasattr(cv2, 'cuda') or cv2.cuda.getCudaEnabledDeviceCount() <= 0:
+                return None
+            
+            filters = {
+                'median': cv2.cuda.createMedianFilter(cv2.CV_8UC1, 3),
+                'clahe': cv2.cuda.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8)),
+                'close': cv2.cuda.createMorphologyFilter(cv2.MORPH_CLOSE, cv2.CV_8UC1, self._close_kernel),
+            }
+            self.logger.info("检测到CUDA设备，图片预处理将使用GPU")
+            return filters
+            
+        except Exception as e:
+            self.logger.warning(f"GPU图片预处理不可用: {e}")
+            return None
     
     def _initialize_ocr_engines(self):
-        """初始化OCR引擎"""
+        """初始化OCR引擎，只登记可用的引擎"""
         try:
+            dispatch = {}
+            
             # 检查Tesseract是否可用
             try:
                 pytesseract.get_tesseract_version()
+                dispatch['tesseract'] = self._tesseract_ocr
                 self.logger.info("Tesseract OCR引擎可用")
             except Exception:
                 self.logger.warning("Tesseract OCR引擎不可用")
             
-            # 其他OCR引擎将在需要时初始化
+            # 其他OCR引擎只检查是否已安装，实例在需要时初始化
+            if importlib.util.find_spec('paddleocr') is not None:
+                dispatch['paddleocr'] = self._paddleocr_recognize
+            else:
+                self.logger.warning("PaddleOCR未安装，跳过此方法")
+            
+            if importlib.util.find_spec('easyocr') is not None:
+                dispatch['easyocr'] = self._easyocr_recognize
+            else:
+                self.logger.warning("EasyOCR未安装，跳过此方法")
+            
+            self._ocr_dispatch = dispatch
+            self.ocr_methods = list(dispatch)
             self.logger.info("OCR引擎初始化完成")
             
         except Exception as e:
@@ -750,8 +1023,11 @@ class OCRCalorieRecognitionModule(BaseModule):
     def cleanup(self) -> bool:
         """清理资源"""
         try:
-            # 保存用户修正数据
-            self._save_user_corrections_to_file()
+            # 保存用户修正数据并关闭日志
+            self._compact_corrections_log()
+            if self._corrections_log is not None:
+                self._corrections_log.close()
+                self._corrections_log = None
             
             # 清理OCR引擎
             self.ocr_engines.clear()
@@ -3,21 +3,111 @@
 结合机器学习和AI分析的混合推荐系统
 """
 
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, List, Optional, Any, Tuple, Iterable, Iterator
+from collections import Counter, defaultdict
+from itertools import chain, combinations as iter_combinations
+import functools
+import hashlib
+import heapq
 import json
+import os
+import pickle
+import re
+import sys
 import numpy as np
+from scipy import sparse
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
+from sklearn.preprocessing import StandardScaler, normalize
 import joblib
 from datetime import datetime, timedelta
 from core.base import BaseModule, ModuleType, UserData, AnalysisResult, BaseConfig
 from pathlib import Path
 import logging
 
+try:
+    # 可选依赖：有CUDA设备时用CuPy在GPU上计算大规模食物相似度
+    import cupy
+    import cupyx.scipy.sparse as cupy_sparse
+except ImportError:
+    cupy = None
+    cupy_sparse = None
+
 logger = logging.getLogger(__name__)
 
+# 用户特征向量维度：基础特征5 + 口味偏好6 + 餐食特征3
+USER_FEATURE_DIM = 14
+
+# 每次返回的餐食搭配数量上限
+MAX_MEAL_COMBINATIONS = 5
+
+# 每种食物保留的相似食物数量
+FOOD_SIMILARITY_TOP_K = 5
+
+# 分块计算食物相似度时每块的行数（峰值内存约为 行数×食物数 个float32）
+SIMILARITY_BLOCK_ROWS = 256
+
+# 食物数量达到该值时才使用GPU计算相似度（规模较小时数据传输开销大于收益）
+GPU_SIMILARITY_MIN_FOODS = 10000
+
+# 超出FOOD_SIMILARITY_TOP_K的相似食物查询结果缓存容量
+SIMILAR_FOODS_CACHE_SIZE = 4096
+
+# 相似用户检索数量
+SIMILAR_USER_TOP_K = 5
+
+# 推荐置信度分档：(最少餐食记录数, 最少反馈数, 置信度)，按置信度从高到低排列
+RECOMMENDATION_CONFIDENCE_TIERS = (
+    (15, 5, 0.9),
+    (10, 3, 0.7),
+    (5, 0, 0.5),
+)
+DEFAULT_RECOMMENDATION_CONFIDENCE = 0.3
+
+# 多路推荐融合时各来源的权重，未列出的来源使用默认权重
+RECOMMENDATION_SOURCE_WEIGHTS = {
+    'historical': 0.4,
+    'similar_user': 0.2,
+    'content_based': 0.2,
+    'physiological': 0.2
+}
+DEFAULT_SOURCE_WEIGHT = 0.1
+
+# 食物数据库的列式（SoA）表示，category为类别编码
+FOOD_TABLE_DTYPE = np.dtype([
+    ('calories', 'f4'),
+    ('protein', 'f4'),
+    ('carbs', 'f4'),
+    ('fat', 'f4'),
+    ('category', 'u1'),
+    ('satisfaction', 'f4'),
+])
+
+# 数据库中不存在的食物使用的默认值，与 _get_food_info 保持一致
+DEFAULT_FOOD_CALORIES = 100
+DEFAULT_FOOD_CATEGORY = "其他"
+DEFAULT_FOOD_SATISFACTION = 4.0
+
+# 口味关键词匹配
+SWEET_KEYWORDS = ('甜', '糖', '蜂蜜', '果', '蛋糕', '巧克力', '冰淇淋')
+SPICY_KEYWORDS = ('辣', '椒', '麻', '辛', '咖喱', '辣椒')
+SWEET_FOOD_RE = re.compile('|'.join(map(re.escape, SWEET_KEYWORDS)))
+SPICY_FOOD_RE = re.compile('|'.join(map(re.escape, SPICY_KEYWORDS)))
+
+# 营养需求 -> 推荐食物
+NUTRITION_FOOD_MAPPING = {
+    '铁质': ('菠菜', '瘦肉', '红枣', '黑芝麻', '猪肝'),
+    '蛋白质': ('鸡蛋', '豆腐', '鱼肉', '鸡肉', '牛奶'),
+    '维生素C': ('橙子', '柠檬', '西红柿', '西兰花', '草莓'),
+    '叶酸': ('绿叶蔬菜', '豆类', '坚果', '菠菜', '芦笋'),
+    '维生素B': ('全谷物', '瘦肉', '蛋类', '香蕉', '土豆'),
+    '锌': ('牡蛎', '瘦肉', '坚果', '豆类', '南瓜子'),
+    '维生素E': ('坚果', '植物油', '鳄梨', '葵花籽', '杏仁'),
+    '镁': ('坚果', '绿叶蔬菜', '全谷物', '黑巧克力', '香蕉'),
+    '维生素B6': ('香蕉', '土豆', '鸡肉', '三文鱼', '鹰嘴豆'),
+    '钙质': ('牛奶', '豆腐', '绿叶蔬菜', '奶酪', '酸奶'),
+}
+
 
 class RecommendationEngine(BaseModule):
     """推荐引擎模块"""
@@ -33,8 +123,24 @@ class RecommendationEngine(BaseModule):
         self.food_similarity_matrix = None
         self.user_preference_model = None
         
+        # L2归一化的食物TF-IDF稀疏向量（行与 _food_names 对应），相似度即向量点积
+        self._food_names = None
+        self._food_vectors = None
+        self._food_vectors_t = None  # _food_vectors 转置的CSR副本，供分块矩阵乘积复用
+        self._food_name_rows: Dict[str, int] = {}
+        # 大K相似食物查询结果缓存，随相似性矩阵一同重建
+        self._similar_foods_cache = functools.lru_cache(maxsize=SIMILAR_FOODS_CACHE_SIZE)(self._query_similar_foods)
+        self._use_gpu_similarity = self._detect_gpu_similarity()
+        
+        # L2归一化的用户特征矩阵（前 len(_user_ids) 行有效，容量按需倍增）
+        self._user_ids = []
+        self._user_rows = {}
+        self._user_matrix = np.empty((0, USER_FEATURE_DIM), dtype=np.float32)
+        
         # 食物数据库
         self.food_database = self._load_food_database()
+        self._food_categories, self._food_rows, self._food_table = self._build_food_table(self.food_database)
+        self._food_info_cache = {}
         
         # 餐食搭配模板
         self.meal_templates = self._load_meal_templates()
@@ -65,7 +171,9 @@ class RecommendationEngine(BaseModule):
             recommendation_type = input_data.get('type', 'meal_recommendation')
             
             if recommendation_type == 'meal_recommendation':
-                result = self._generate_meal_recommendations(input_data, user_data)
+                # 每次请求只遍历一次用户餐食记录，索引随请求传递，不跨请求保留
+                meal_index = self._build_meal_index(user_data.meals)
+                result = self._generate_meal_recommendations(input_data, user_data, meal_index)
             elif recommendation_type == 'food_similarity':
                 result = self._find_similar_foods(input_data, user_data)
             elif recommendation_type == 'preference_update':
@@ -86,7 +194,8 @@ class RecommendationEngine(BaseModule):
             self.logger.error(f"处理推荐请求失败: {e}")
             return self._create_error_result(str(e))
     
-    def _generate_meal_recommendations(self, input_data: Dict, user_data: UserData) -> Dict[str, Any]:
+    def _generate_meal_recommendations(self, input_data: Dict, user_data: UserData,
+                                       meal_index: Dict[str, Any]) -> Dict[str, Any]:
         """生成餐食推荐"""
         meal_type = input_data.get('meal_type', 'lunch')
         preferences = input_data.get('preferences', {})
@@ -94,7 +203,7 @@ class RecommendationEngine(BaseModule):
         
         try:
             # 生成完整餐食搭配推荐
-            meal_combinations = self._generate_meal_combinations(user_data, meal_type, preferences, context)
+            meal_combinations = self._generate_meal_combinations(user_data, meal_type, preferences, context, meal_index)
             
             return {
                 'success': True,
@@ -112,70 +221,66 @@ class RecommendationEngine(BaseModule):
             return self._create_error_result(f"推荐生成失败: {str(e)}")
     
     def _generate_meal_combinations(self, user_data: UserData, meal_type: str, 
-                                 preferences: Dict, context: Dict) -> List[Dict[str, Any]]:
-        """生成基于用户数据的动态餐食搭配组合"""
-        combinations = []
-        
+                                 preferences: Dict, context: Dict,
+                                 meal_index: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """生成基于用户数据的动态餐食搭配组合
+
+        各来源按优先级惰性产出搭配，凑够MAX_MEAL_COMBINATIONS个不重复的组合后即停止。
+        """
         try:
-            # 1. 基于用户历史数据生成搭配
-            historical_combinations = self._generate_historical_combinations(user_data, meal_type)
-            combinations.extend(historical_combinations)
-            
-            # 2. 基于用户偏好生成个性化搭配
-            personalized_combinations = self._generate_personalized_combinations(user_data, meal_type, preferences)
-            combinations.extend(personalized_combinations)
+            # 1. 依次基于用户历史数据、用户偏好、相似用户生成搭配
+            candidates = chain(
+                self._generate_historical_combinations(meal_index, meal_type),
+                self._generate_personalized_combinations(meal_index, meal_type, preferences),
+                self._generate_similar_user_combinations(user_data, meal_type)
+            )
             
-            # 3. 基于相似用户生成搭配
-            similar_user_combinations = self._generate_similar_user_combinations(user_data, meal_type)
-            combinations.extend(similar_user_combinations)
+            # 2. 去重和排序
+            combinations = self._deduplicate_and_rank_combinations(candidates, user_data)
             
-            # 4. 如果没有足够数据，使用模板生成
+            # 3. 如果没有足够数据，使用模板补充
             if len(combinations) < 3:
                 template_combinations = self._generate_template_combinations(user_data, meal_type)
-                combinations.extend(template_combinations)
+                combinations = self._deduplicate_and_rank_combinations(
+                    chain(combinations, template_combinations), user_data
+                )
             
-            # 5. 去重和排序
-            combinations = self._deduplicate_and_rank_combinations(combinations, user_data)
-            
-            # 6. 确保至少有一些推荐
+            # 4. 确保至少有一些推荐
             if not combinations:
                 combinations = self._generate_fallback_combinations(meal_type)
             
-            return combinations[:5]  # 返回前5个最佳搭配
+            return combinations[:MAX_MEAL_COMBINATIONS]  # 返回最佳搭配
             
         except Exception as e:
             self.logger.error(f"生成餐食搭配失败: {e}")
             # 返回基础推荐
             return self._generate_fallback_combinations(meal_type)
 
-    def _generate_historical_combinations(self, user_data: UserData, meal_type: str) -> List[Dict[str, Any]]:
+    def _generate_historical_combinations(self, meal_index: Dict[str, Any], meal_type: str) -> Iterator[Dict[str, Any]]:
         """基于用户历史数据生成搭配"""
-        combinations = []
+        generated = 0
         
-        # 获取该餐次的所有历史记录
-        meal_records = [meal for meal in user_data.meals if meal.get('meal_type') == meal_type]
+        # 获取该餐次满意度>=4的历史记录
+        meal_records = meal_index['liked_by_type'].get(meal_type, [])
         
         if not meal_records:
-            return combinations
+            return
         
         # 分析高频搭配
-        food_combinations = {}
+        food_combinations = Counter()
         for meal in meal_records:
             foods = meal.get('foods', [])
-            if len(foods) >= 2 and meal.get('satisfaction_score', 0) >= 4:
-                # 生成2-3食物组合
-                for i in range(len(foods)):
-                    for j in range(i+1, min(i+3, len(foods))):
-                        combo = tuple(sorted(foods[i:j+1]))
-                        food_combinations[combo] = food_combinations.get(combo, 0) + 1
+            if len(foods) >= 2:
+                # 生成2-3食物组合（食物先排序，组合即为规范顺序）
+                sorted_foods = sorted(foods)
+                food_combinations.update(iter_combinations(sorted_foods, 2))
+                food_combinations.update(iter_combinations(sorted_foods, 3))
         
         # 选择出现频率最高的搭配
-        sorted_combinations = sorted(food_combinations.items(), key=lambda x: x[1], reverse=True)
-        
-        for combo, count in sorted_combinations[:2]:  # 取前2个高频搭配
+        for combo, count in food_combinations.most_common(2):  # 取前2个高频搭配
             if count >= 2:  # 至少出现2次
                 combination = {
-                    "name": f"历史搭配{len(combinations)+1}",
+                    "name": f"历史搭配{generated + 1}",
                     "description": f"基于您{meal_type}的历史偏好",
                     "foods": [],
                     "total_calories": 0,
@@ -193,16 +298,13 @@ class RecommendationEngine(BaseModule):
                 
                 if len(combination["foods"]) >= 2:
                     combination["nutrition_score"] = self._calculate_nutrition_score(combination["foods"])
-                    combinations.append(combination)
-        
-        return combinations
+                    generated += 1
+                    yield combination
 
-    def _generate_personalized_combinations(self, user_data: UserData, meal_type: str, preferences: Dict) -> List[Dict[str, Any]]:
+    def _generate_personalized_combinations(self, meal_index: Dict[str, Any], meal_type: str, preferences: Dict) -> Iterator[Dict[str, Any]]:
         """基于用户偏好生成个性化搭配"""
-        combinations = []
-        
         # 获取用户喜爱的食物
-        favorite_foods = self._get_user_favorite_foods(user_data, meal_type)
+        favorite_foods = self._get_user_favorite_foods(meal_index, meal_type)
         
         if len(favorite_foods) >= 2:
             combination = {
@@ -226,18 +328,14 @@ class RecommendationEngine(BaseModule):
             
             if len(combination["foods"]) >= 2:
                 combination["nutrition_score"] = self._calculate_nutrition_score(combination["foods"])
-                combinations.append(combination)
-        
-        return combinations
+                yield combination
 
-    def _generate_similar_user_combinations(self, user_data: UserData, meal_type: str) -> List[Dict[str, Any]]:
+    def _generate_similar_user_combinations(self, user_data: UserData, meal_type: str) -> Iterator[Dict[str, Any]]:
         """基于相似用户生成搭配"""
-        return []  # 暂时返回空列表
+        return iter(())  # 暂时没有搭配
 
-    def _generate_template_combinations(self, user_data: UserData, meal_type: str) -> List[Dict[str, Any]]:
+    def _generate_template_combinations(self, user_data: UserData, meal_type: str) -> Iterator[Dict[str, Any]]:
         """基于模板生成搭配（当历史数据不足时）"""
-        combinations = []
-        
         templates = self.meal_templates.get(meal_type, [])
         
         for template in templates[:2]:  # 只使用前2个模板
@@ -261,9 +359,7 @@ class RecommendationEngine(BaseModule):
             
             if len(combination["foods"]) >= 2:
                 combination["nutrition_score"] = self._calculate_nutrition_score(combination["foods"])
-                combinations.append(combination)
-        
-        return combinations
+                yield combination
 
     def _select_common_food_for_category(self, category: str, meal_type: str) -> Dict[str, Any]:
         """为特定类别选择常见食物"""
@@ -293,26 +389,35 @@ class RecommendationEngine(BaseModule):
         
         return None
 
-    def _deduplicate_and_rank_combinations(self, combinations: List[Dict], user_data: UserData) -> List[Dict]:
-        """去重和排序搭配组合"""
-        # 去重：基于食物组合去重
+    def _deduplicate_and_rank_combinations(self, combinations: Iterable[Dict], user_data: UserData) -> List[Dict]:
+        """去重和排序搭配组合
+
+        按顺序消费combinations，收集到MAX_MEAL_COMBINATIONS个不重复的组合后即停止，
+        后续来源不再生成。
+        """
+        # 去重：基于食物组合去重（frozenset与顺序无关，无需排序）
         unique_combinations = []
         seen_combinations = set()
         
         for combo in combinations:
-            food_names = tuple(sorted([f["name"] for f in combo["foods"]]))
+            food_names = frozenset(f["name"] for f in combo["foods"])
             if food_names not in seen_combinations:
                 seen_combinations.add(food_names)
                 unique_combinations.append(combo)
+                if len(unique_combinations) >= MAX_MEAL_COMBINATIONS:
+                    break
         
-        # 排序：综合得分
-        def score_combination(combo):
-            personal_score = combo.get("personalization_score", 0) * 0.4
-            nutrition_score = combo.get("nutrition_score", 0) * 0.3
-            satisfaction_score = sum(f.get("satisfaction_score", 4) for f in combo["foods"]) / len(combo["foods"]) * 0.3
-            return personal_score + nutrition_score + satisfaction_score
-        
-        return sorted(unique_combinations, key=score_combination, reverse=True)
+        # 排序：综合得分（key函数对每个组合只计算一次）；调用方只使用前MAX_MEAL_COMBINATIONS个
+        return heapq.nlargest(MAX_MEAL_COMBINATIONS, unique_combinations, key=self._score_combination)
+    
+    @staticmethod
+    def _score_combination(combo: Dict) -> float:
+        """计算搭配组合的综合得分"""
+        foods = combo["foods"]
+        personal_score = combo.get("personalization_score", 0) * 0.4
+        nutrition_score = combo.get("nutrition_score", 0) * 0.3
+        satisfaction_score = sum(f.get("satisfaction_score", 4) for f in foods) / len(foods) * 0.3
+        return personal_score + nutrition_score + satisfaction_score
 
     def _generate_meal_reasoning(self, combinations: List[Dict], user_data: UserData, meal_type: str) -> str:
         """生成动态餐食推荐理由"""
@@ -344,55 +449,105 @@ class RecommendationEngine(BaseModule):
         
         return "，".join(reasoning_parts) if reasoning_parts else "营养搭配推荐"
 
-    def _get_user_favorite_foods(self, user_data: UserData, meal_type: str) -> List[str]:
+    def _get_user_favorite_foods(self, meal_index: Dict[str, Any], meal_type: str) -> List[str]:
         """获取用户喜爱的食物"""
         favorite_foods = []
         
         # 从历史餐食记录中提取
-        for meal in user_data.meals:
-            if meal.get('meal_type') == meal_type and meal.get('satisfaction_score', 0) >= 4:
-                favorite_foods.extend(meal.get('foods', []))
+        for meal in meal_index['liked_by_type'].get(meal_type, []):
+            favorite_foods.extend(meal.get('foods', []))
         
         # 统计频率
         food_counts = {}
         for food in favorite_foods:
             food_counts[food] = food_counts.get(food, 0) + 1
         
-        # 按频率排序
-        sorted_foods = sorted(food_counts.items(), key=lambda x: x[1], reverse=True)
-        return [food for food, count in sorted_foods[:10]]
+        # 按频率取前10
+        top_foods = heapq.nlargest(10, food_counts.items(), key=lambda x: x[1])
+        return [food for food, count in top_foods]
 
+    @staticmethod
+    def _build_meal_index(meals: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """构建餐食索引：按餐次分组的全部记录、满意度>=4的记录，以及所有满意度>=4的记录
+
+        索引只在单次请求内使用，由调用方作为参数传给各辅助方法。
+        """
+        by_type = defaultdict(list)
+        liked_by_type = defaultdict(list)
+        liked = []
+        for meal in meals:
+            meal_type = meal.get('meal_type')
+            by_type[meal_type].append(meal)
+            if meal.get('satisfaction_score', 0) >= 4:
+                liked_by_type[meal_type].append(meal)
+                liked.append(meal)
+        
+        return {
+            'by_type': dict(by_type),
+            'liked_by_type': dict(liked_by_type),
+            'liked': liked
+        }
+    
     def _get_food_info(self, food_name: str) -> Dict[str, Any]:
-        """获取食物信息"""
+        """获取食物信息（结果按名称缓存，调用方只读不改）"""
+        cached = self._food_info_cache.get(food_name)
+        if cached is not None:
+            return cached
+        
         # 从食物数据库获取信息
         food_info = self.food_database.get(food_name, {})
-        return {
+        cached = self._food_info_cache[food_name] = {
             "name": food_name,
-            "calories": food_info.get("calories", 100),
-            "category": food_info.get("category", "其他"),
+            "calories": food_info.get("calories", DEFAULT_FOOD_CALORIES),
+            "category": food_info.get("category", DEFAULT_FOOD_CATEGORY),
             "nutrition": food_info.get("nutrition", {}),
-            "satisfaction_score": food_info.get("avg_satisfaction", 4.0)
+            "satisfaction_score": food_info.get("avg_satisfaction", DEFAULT_FOOD_SATISFACTION)
         }
+        return cached
 
     def _calculate_nutrition_score(self, foods: List[Dict]) -> float:
         """计算营养得分"""
         if not foods:
             return 0.0
         
-        # 简单的营养评分逻辑
-        score = 0.0
-        categories = set()
-        
-        for food in foods:
-            category = food.get("category", "其他")
-            categories.add(category)
-            score += food.get("satisfaction_score", 4.0)
+        # 简单的营养评分逻辑：平均满意度 + 类别多样性加分
+        unknown_row = len(self._food_rows)
+        rows = self._food_table[[self._food_rows.get(food.get("name"), unknown_row) for food in foods]]
         
         # 多样性加分
-        diversity_bonus = min(len(categories) * 0.1, 0.3)
+        diversity_bonus = min(len(np.unique(rows['category'])) * 0.1, 0.3)
         
-        return (score / len(foods)) + diversity_bonus
+        return float(rows['satisfaction'].mean()) + diversity_bonus
+    
+    def _build_food_table(self, food_database: Dict[str, Dict]) -> Tuple[List[str], Dict[str, int], np.ndarray]:
+        """将食物数据库转换为结构化数组
 
+        返回 (类别名称列表, 食物名称->行号, 结构化数组)，数组末尾额外一行为未知食物的默认值。
+        """
+        categories = [DEFAULT_FOOD_CATEGORY]
+        category_codes = {DEFAULT_FOOD_CATEGORY: 0}
+        food_rows = {}
+        table = np.zeros(len(food_database) + 1, dtype=FOOD_TABLE_DTYPE)
+        
+        for row, (name, info) in enumerate(food_database.items()):
+            category = info.get("category", DEFAULT_FOOD_CATEGORY)
+            if category not in category_codes:
+                category_codes[category] = len(categories)
+                categories.append(category)
+            
+            food_rows[name] = row
+            table[row] = (
+                info.get("calories", DEFAULT_FOOD_CALORIES),
+                info.get("protein", 0),
+                info.get("carbs", 0),
+                info.get("fat", 0),
+                category_codes[category],
+                info.get("avg_satisfaction", DEFAULT_FOOD_SATISFACTION),
+            )
+        
+        table[-1] = (DEFAULT_FOOD_CALORIES, 0, 0, 0, 0, DEFAULT_FOOD_SATISFACTION)
+        return categories, food_rows, table
+    
     def _generate_fallback_combinations(self, meal_type: str) -> List[Dict[str, Any]]:
         """生成备选推荐（当其他方法都失败时）"""
         combinations = []
@@ -452,27 +607,37 @@ class RecommendationEngine(BaseModule):
         if not historical_meals:
             return recommendations
         
-        # 统计用户喜欢的食物
-        food_scores = {}
+        # 统计用户喜欢的食物：食物按首次出现顺序编号
+        food_ids = {}
+        ids = []
+        satisfactions = []
         for meal in historical_meals:
             satisfaction = meal.get('satisfaction_score', 3)  # 默认3分
             for food in meal.get('foods', []):
-                if food not in food_scores:
-                    food_scores[food] = []
-                food_scores[food].append(satisfaction)
+                ids.append(food_ids.setdefault(food, len(food_ids)))
+                satisfactions.append(satisfaction)
+        
+        if not ids:
+            return recommendations
         
         # 计算平均满意度
-        for food, scores in food_scores.items():
-            avg_score = np.mean(scores)
-            if avg_score >= 3:  # 只推荐满意度>=3的食物
-                recommendations.append({
-                    'food': food,
-                    'score': avg_score,
-                    'type': 'historical',
-                    'reason': f'历史满意度: {avg_score:.1f}分'
-                })
+        ids = np.asarray(ids, dtype=np.intp)
+        avg_scores = np.bincount(ids, weights=satisfactions) / np.bincount(ids)
+        
+        # 只推荐满意度>=3的食物，按满意度降序（同分保持首次出现顺序）
+        foods = list(food_ids)
+        for i in np.argsort(-avg_scores, kind='stable'):
+            avg_score = float(avg_scores[i])
+            if avg_score < 3:
+                break
+            recommendations.append({
+                'food': foods[i],
+                'score': avg_score,
+                'type': 'historical',
+                'reason': f'历史满意度: {avg_score:.1f}分'
+            })
         
-        return sorted(recommendations, key=lambda x: x['score'], reverse=True)
+        return recommendations
     
     def _get_similar_user_recommendations(self, user_data: UserData, meal_type: str) -> List[Dict[str, Any]]:
         """基于相似用户的推荐"""
@@ -485,8 +650,9 @@ class RecommendationEngine(BaseModule):
             # 获取用户特征向量
             user_features = self._extract_user_features(user_data)
             
-            # 找到相似用户
-            similar_users = self._find_similar_users(user_features)
+            # 找到相似用户，并登记当前用户供后续检索
+            similar_users = self._find_similar_users(user_features, exclude_user_id=user_data.user_id)
+            self._register_user_features(user_data.user_id, user_features)
             
             # 基于相似用户的偏好推荐
             for similar_user_id in similar_users:
@@ -507,31 +673,31 @@ class RecommendationEngine(BaseModule):
         """基于内容相似性的推荐"""
         recommendations = []
         
-        if not self.food_similarity_matrix:
+        if self.food_similarity_matrix is None:
             return recommendations
         
         try:
-            # 获取用户喜欢的食物
-            liked_foods = []
-            for meal in user_data.meals:
-                if meal.get('satisfaction_score', 0) >= 4:  # 满意度>=4的食物
-                    liked_foods.extend(meal.get('foods', []))
+            # 获取用户喜欢的食物（去重并保持首次出现顺序，dict键可O(1)判断成员）
+            liked_foods = dict.fromkeys(
+                food
+                for meal in user_data.meals
+                if meal.get('satisfaction_score', 0) >= 4  # 满意度>=4的食物
+                for food in meal.get('foods', [])
+            )
             
             if not liked_foods:
                 return recommendations
             
             # 基于食物相似性推荐
             for liked_food in liked_foods:
-                if liked_food in self.food_similarity_matrix:
-                    similar_foods = self.food_similarity_matrix[liked_food]
-                    for food, similarity in similar_foods.items():
-                        if food not in liked_foods:  # 避免重复推荐
-                            recommendations.append({
-                                'food': food,
-                                'score': similarity,
-                                'type': 'content_based',
-                                'reason': f'与{liked_food}相似'
-                            })
+                for food, similarity in self._get_similar_foods(liked_food):
+                    if food not in liked_foods:  # 避免重复推荐
+                        recommendations.append({
+                            'food': food,
+                            'score': similarity,
+                            'type': 'content_based',
+                            'reason': f'与{liked_food}相似'
+                        })
             
         except Exception as e:
             self.logger.error(f"内容推荐失败: {e}")
@@ -550,21 +716,8 @@ class RecommendationEngine(BaseModule):
             return recommendations
         
         # 根据营养需求推荐食物
-        nutrition_food_mapping = {
-            '铁质': ['菠菜', '瘦肉', '红枣', '黑芝麻', '猪肝'],
-            '蛋白质': ['鸡蛋', '豆腐', '鱼肉', '鸡肉', '牛奶'],
-            '维生素C': ['橙子', '柠檬', '西红柿', '西兰花', '草莓'],
-            '叶酸': ['绿叶蔬菜', '豆类', '坚果', '菠菜', '芦笋'],
-            '维生素B': ['全谷物', '瘦肉', '蛋类', '香蕉', '土豆'],
-            '锌': ['牡蛎', '瘦肉', '坚果', '豆类', '南瓜子'],
-            '维生素E': ['坚果', '植物油', '鳄梨', '葵花籽', '杏仁'],
-            '镁': ['坚果', '绿叶蔬菜', '全谷物', '黑巧克力', '香蕉'],
-            '维生素B6': ['香蕉', '土豆', '鸡肉', '三文鱼', '鹰嘴豆'],
-            '钙质': ['牛奶', '豆腐', '绿叶蔬菜', '奶酪', '酸奶']
-        }
-        
         for need in needs:
-            foods = nutrition_food_mapping.get(need, [])
+            foods = NUTRITION_FOOD_MAPPING.get(need, ())
             for food in foods:
                 recommendations.append({
                     'food': food,
@@ -577,77 +730,76 @@ class RecommendationEngine(BaseModule):
     
     def _fuse_recommendations(self, recommendation_lists: List[List[Dict]], user_data: UserData) -> List[Dict[str, Any]]:
         """融合多种推荐结果"""
-        food_scores = {}
-        
-        # 权重配置
-        weights = {
-            'historical': 0.4,
-            'similar_user': 0.2,
-            'content_based': 0.2,
-            'physiological': 0.2
-        }
+        # 展平：食物按首次出现顺序编号，加权得分与编号并列存放
+        food_ids = {}
+        ids = []
+        weighted_scores = []
+        reasons = []
+        types = []
         
         for rec_list in recommendation_lists:
             for rec in rec_list:
-                food = rec['food']
-                score = rec['score']
                 rec_type = rec['type']
+                food_id = food_ids.setdefault(rec['food'], len(food_ids))
+                if food_id == len(reasons):
+                    reasons.append([])
+                    types.append([])
                 
-                if food not in food_scores:
-                    food_scores[food] = {
-                        'total_score': 0,
-                        'count': 0,
-                        'reasons': [],
-                        'types': []
-                    }
-                
-                weight = weights.get(rec_type, 0.1)
-                food_scores[food]['total_score'] += score * weight
-                food_scores[food]['count'] += 1
-                food_scores[food]['reasons'].append(rec['reason'])
-                food_scores[food]['types'].append(rec_type)
-        
-        # 转换为推荐列表
-        recommendations = []
-        for food, data in food_scores.items():
-            recommendations.append({
-                'food': food,
-                'score': data['total_score'],
-                'count': data['count'],
-                'reasons': data['reasons'],
-                'types': data['types']
-            })
-        
-        return sorted(recommendations, key=lambda x: x['score'], reverse=True)
+                ids.append(food_id)
+                weighted_scores.append(
+                    rec['score'] * RECOMMENDATION_SOURCE_WEIGHTS.get(rec_type, DEFAULT_SOURCE_WEIGHT)
+                )
+                reasons[food_id].append(rec['reason'])
+                types[food_id].append(rec_type)
+        
+        if not ids:
+            return []
+        
+        # 按食物聚合得分与次数
+        ids = np.asarray(ids, dtype=np.intp)
+        total_scores = np.bincount(ids, weights=weighted_scores)
+        counts = np.bincount(ids)
+        
+        # 转换为推荐列表（稳定排序，同分时保持首次出现顺序）
+        foods = list(food_ids)
+        return [
+            {
+                'food': foods[i],
+                'score': float(total_scores[i]),
+                'count': int(counts[i]),
+                'reasons': reasons[i],
+                'types': types[i]
+            }
+            for i in np.argsort(-total_scores, kind='stable')
+        ]
     
     def _filter_and_rank_recommendations(self, recommendations: List[Dict], 
                                        user_data: UserData, preferences: Dict) -> List[Dict[str, Any]]:
         """过滤和排序推荐"""
         filtered = []
         
-        # 获取用户不喜欢的食物
-        dislikes = user_data.profile.get('dislikes', [])
-        allergies = user_data.profile.get('allergies', [])
+        # 不喜欢和过敏的食物关键词合并为一个正则，每条推荐只需一次匹配
+        excluded = [*user_data.profile.get('dislikes', []), *user_data.profile.get('allergies', [])]
+        excluded_re = re.compile('|'.join(map(re.escape, excluded))) if excluded else None
+        
+        # 用户口味偏好在循环外确定：不符合口味的食物得分打8折
+        taste_matcher = None
+        if preferences:
+            taste_matcher = {
+                'sweet': self._is_sweet_food,
+                'spicy': self._is_spicy_food
+            }.get(preferences.get('taste'))
         
         for rec in recommendations:
             food = rec['food']
             
-            # 过滤不喜欢的食物
-            if any(dislike in food for dislike in dislikes):
-                continue
-            
-            # 过滤过敏食物
-            if any(allergy in food for allergy in allergies):
+            # 过滤不喜欢和过敏的食物
+            if excluded_re is not None and excluded_re.search(food):
                 continue
             
             # 应用用户偏好
-            if preferences:
-                if 'taste' in preferences:
-                    taste = preferences['taste']
-                    if taste == 'sweet' and not self._is_sweet_food(food):
-                        rec['score'] *= 0.8
-                    elif taste == 'spicy' and not self._is_spicy_food(food):
-                        rec['score'] *= 0.8
+            if taste_matcher is not None and not taste_matcher(food):
+                rec['score'] *= 0.8
             
             filtered.append(rec)
         
@@ -671,54 +823,84 @@ class RecommendationEngine(BaseModule):
         meal_count = len(user_data.meals)
         feedback_count = len(user_data.feedback)
         
-        # 基于数据量计算置信度
-        if meal_count >= 15 and feedback_count >= 5:
-            return 0.9
-        elif meal_count >= 10 and feedback_count >= 3:
-            return 0.7
-        elif meal_count >= 5:
-            return 0.5
-        else:
-            return 0.3
+        # 基于数据量计算置信度：取满足条件的最高一档
+        for min_meals, min_feedback, confidence in RECOMMENDATION_CONFIDENCE_TIERS:
+            if meal_count >= min_meals and feedback_count >= min_feedback:
+                return confidence
+        return DEFAULT_RECOMMENDATION_CONFIDENCE
     
     def _extract_user_features(self, user_data: UserData) -> np.ndarray:
         """提取用户特征向量"""
-        features = []
+        features = np.empty(USER_FEATURE_DIM, dtype=np.float32)
         
         # 基础特征
         profile = user_data.profile
-        features.extend([
-            profile.get('age', 25),
-            profile.get('height', 165),
-            profile.get('weight', 60),
-            len(profile.get('allergies', [])),
-            len(profile.get('dislikes', []))
-        ])
+        features[0] = profile.get('age', 25)
+        features[1] = profile.get('height', 165)
+        features[2] = profile.get('weight', 60)
+        features[3] = len(profile.get('allergies', []))
+        features[4] = len(profile.get('dislikes', []))
         
         # 口味偏好特征
         taste_prefs = profile.get('taste_preferences', {})
-        features.extend([
-            taste_prefs.get('sweet', 3),
-            taste_prefs.get('salty', 3),
-            taste_prefs.get('spicy', 3),
-            taste_prefs.get('sour', 3),
-            taste_prefs.get('bitter', 3),
-            taste_prefs.get('umami', 3)
-        ])
+        features[5] = taste_prefs.get('sweet', 3)
+        features[6] = taste_prefs.get('salty', 3)
+        features[7] = taste_prefs.get('spicy', 3)
+        features[8] = taste_prefs.get('sour', 3)
+        features[9] = taste_prefs.get('bitter', 3)
+        features[10] = taste_prefs.get('umami', 3)
         
         # 餐食特征
-        features.extend([
-            len(user_data.meals),
-            np.mean([meal.get('satisfaction_score', 3) for meal in user_data.meals]) if user_data.meals else 3,
-            len(user_data.feedback)
-        ])
-        
-        return np.array(features)
+        meals = user_data.meals
+        satisfaction = np.fromiter((meal.get('satisfaction_score', 3) for meal in meals),
+                                   dtype=np.float32, count=len(meals))
+        features[11] = len(meals)
+        features[12] = satisfaction.mean() if satisfaction.size else 3
+        features[13] = len(user_data.feedback)
+        
+        return features
+    
+    def _find_similar_users(self, user_features: np.ndarray, top_k: int = SIMILAR_USER_TOP_K,
+                            exclude_user_id: Optional[str] = None) -> List[str]:
+        """找到相似用户：与已登记用户特征矩阵做一次矩阵-向量乘积，按余弦相似度取前K个"""
+        user_count = len(self._user_ids)
+        norm = np.linalg.norm(user_features)
+        if user_count == 0 or norm == 0:
+            return []
+        
+        similarities = self._user_matrix[:user_count] @ (user_features / norm).astype(np.float32)
+        
+        exclude_row = self._user_rows.get(exclude_user_id)
+        if exclude_row is not None:
+            similarities[exclude_row] = -np.inf
+            user_count -= 1
+        
+        top_k = min(top_k, user_count)
+        if top_k <= 0:
+            return []
+        
+        top_rows = np.argpartition(-similarities, top_k - 1)[:top_k]
+        top_rows = top_rows[np.argsort(-similarities[top_rows], kind='stable')]
+        return [self._user_ids[row] for row in top_rows]
     
-    def _find_similar_users(self, user_features: np.ndarray) -> List[str]:
-        """找到相似用户"""
-        # 这里简化实现，实际应该基于用户聚类模型
-        return []
+    def _register_user_features(self, user_id: str, user_features: np.ndarray):
+        """登记（或更新）用户的归一化特征向量"""
+        norm = np.linalg.norm(user_features)
+        if norm == 0:
+            return
+        
+        row = self._user_rows.get(user_id)
+        if row is None:
+            row = len(self._user_ids)
+            if row == len(self._user_matrix):
+                # 容量倍增，摊销追加开销
+                grown = np.empty((max(16, 2 * row), USER_FEATURE_DIM), dtype=np.float32)
+                grown[:row] = self._user_matrix
+                self._user_matrix = grown
+            self._user_rows[user_id] = row
+            self._user_ids.append(user_id)
+        
+        self._user_matrix[row] = user_features / norm
     
     def _get_user_data_by_id(self, user_id: str) -> Optional[UserData]:
         """根据ID获取用户数据"""
@@ -727,16 +909,16 @@ class RecommendationEngine(BaseModule):
     
     def _is_sweet_food(self, food: str) -> bool:
         """判断是否为甜食"""
-        sweet_keywords = ['甜', '糖', '蜂蜜', '果', '蛋糕', '巧克力', '冰淇淋']
-        return any(keyword in food for keyword in sweet_keywords)
+        return SWEET_FOOD_RE.search(food) is not None
     
     def _is_spicy_food(self, food: str) -> bool:
         """判断是否为辣食"""
-        spicy_keywords = ['辣', '椒', '麻', '辛', '咖喱', '辣椒']
-        return any(keyword in food for keyword in spicy_keywords)
+        return SPICY_FOOD_RE.search(food) is not None
     
-    def _load_meal_templates(self) -> Dict[str, List[Dict]]:
-        """加载基础餐食搭配模板（作为备选方案）"""
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _load_meal_templates() -> Dict[str, List[Dict]]:
+        """加载基础餐食搭配模板（作为备选方案，进程内只构建一次，各实例共享且只读）"""
         return {
             "breakfast": [
                 {"name": "经典早餐", "categories": ["主食", "蛋白质", "饮品"]},
@@ -758,8 +940,10 @@ class RecommendationEngine(BaseModule):
             ]
         }
 
-    def _load_food_database(self) -> Dict[str, Dict]:
-        """加载食物数据库"""
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _load_food_database() -> Dict[str, Dict]:
+        """加载食物数据库（进程内只构建一次，各实例共享且只读）"""
         return {
             '米饭': {'calories': 130, 'protein': 2.7, 'carbs': 28, 'fat': 0.3, 'category': '主食'},
             '面条': {'calories': 131, 'protein': 5, 'carbs': 25, 'fat': 1.1, 'category': '主食'},
@@ -781,7 +965,7 @@ class RecommendationEngine(BaseModule):
             # 尝试加载现有模型
             tfidf_path = self.model_path / 'tfidf_vectorizer.pkl'
             if tfidf_path.exists():
-                self.tfidf_vectorizer = joblib.load(tfidf_path)
+                self.tfidf_vectorizer = joblib.load(tfidf_path, mmap_mode='r')
                 self.logger.info("TF-IDF向量化器加载成功")
             
             # 构建食物相似性矩阵
@@ -800,65 +984,396 @@ class RecommendationEngine(BaseModule):
             
             # 获取所有食物名称
             food_names = list(self.food_database.keys())
+            # 名称驻留后只存一份，查询结果直接复用这些字符串对象
+            self._food_names = tuple(map(sys.intern, food_names))
+            self._food_name_rows = {name: i for i, name in enumerate(self._food_names)}
+            self._similar_foods_cache.cache_clear()
             
-            # 使用TF-IDF计算相似性
-            food_features = self.tfidf_vectorizer.transform(food_names)
-            similarity_matrix = cosine_similarity(food_features)
-            
-            # 构建相似性字典
-            self.food_similarity_matrix = {}
-            for i, food1 in enumerate(food_names):
-                similarities = {}
-                for j, food2 in enumerate(food_names):
-                    if i != j:
-                        similarities[food2] = similarity_matrix[i][j]
-                
-                # 按相似性排序
-                sorted_similarities = sorted(similarities.items(), key=lambda x: x[1], reverse=True)
-                self.food_similarity_matrix[food1] = dict(sorted_similarities[:5])  # 只保留前5个相似食物
+            # 食物列表与向量化器都未变化时，直接复用磁盘上的相似性矩阵
+            fingerprint = self._food_similarity_fingerprint(food_names)
+            if self._load_food_similarity_cache(fingerprint):
+                self.logger.info("食物相似性矩阵从缓存加载")
+                return
+            
+            # 使用TF-IDF计算相似性：向量L2归一化后，余弦相似度即稀疏矩阵乘积
+            self._set_food_vectors(self._transform_food_names(food_names))
+            n_foods = len(food_names)
+            top_k = max(min(FOOD_SIMILARITY_TOP_K, n_foods - 1), 0)
+            
+            indices = data = None
+            if self._use_gpu_similarity and top_k > 0 and n_foods >= GPU_SIMILARITY_MIN_FOODS:
+                try:
+                    indices, data = self._top_k_similarities_gpu(top_k)
+                except Exception as e:
+                    self.logger.warning(f"GPU相似度计算失败，回退到CPU: {e}")
+            if indices is None:
+                indices, data = self._top_k_similarities_cpu(top_k)
+            
+            # 只保留前K个相似食物，存为CSR稀疏矩阵（每行内按相似度降序）
+            indptr = np.arange(n_foods + 1, dtype=np.int32) * top_k
+            self.food_similarity_matrix = sparse.csr_matrix(
+                (data.ravel(), indices.ravel(), indptr), shape=(n_foods, n_foods)
+            )
+            self._save_food_similarity_cache(fingerprint)
             
             self.logger.info("食物相似性矩阵构建完成")
             
         except Exception as e:
             self.logger.error(f"构建食物相似性矩阵失败: {e}")
-            self.food_similarity_matrix = {}
+            self.food_similarity_matrix = None
+    
+    def _transform_food_names(self, food_names: List[str]) -> sparse.csr_matrix:
+        """将食物名称转换为L2归一化的float32 TF-IDF稀疏向量
+
+        TfidfVectorizer默认已做L2归一化，仅在加载的旧模型未归一化时补做。
+        """
+        food_features = self.tfidf_vectorizer.transform(food_names).astype(np.float32, copy=False)
+        if getattr(self.tfidf_vectorizer, 'norm', None) != 'l2':
+            food_features = normalize(food_features)
+        return food_features.tocsr()
+    
+    def add_foods(self, foods: Dict[str, Dict]) -> bool:
+        """向食物数据库追加食物（供外部调用的接口，应用内暂无调用方）
+
+        不重新训练向量化器，只为新增食物计算向量，并增量更新相似性矩阵。
+        所有可能失败的计算都在局部变量中完成，成功后才一次性替换实例状态。
+        """
+        try:
+            new_foods = {name: info for name, info in foods.items() if name not in self.food_database}
+            if not new_foods:
+                return True
+            
+            # 食物数据库由各实例共享，追加时生成新字典而不修改原对象
+            food_database = {**self.food_database, **new_foods}
+            food_table = self._build_food_table(food_database)
+            similarity = self._extend_food_similarity_matrix(list(new_foods))
+            
+            self.food_database = food_database
+            self._food_categories, self._food_rows, self._food_table = food_table
+            self._food_info_cache = {}
+            
+            if similarity is None:
+                self._build_food_similarity_matrix()
+                return True
+            
+            # 替换后不再引用从缓存文件内存映射的旧数组，之后才能覆盖该文件（Windows下被映射的文件无法替换）
+            (self._food_names, self._food_name_rows, self._food_vectors,
+             self._food_vectors_t, self.food_similarity_matrix) = similarity
+            del similarity
+            self._similar_foods_cache.cache_clear()
+            self._save_food_similarity_cache(self._food_similarity_fingerprint(list(self._food_names)))
+            
+            self.logger.info(f"食物相似性矩阵增量更新完成，新增{len(new_foods)}种食物")
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"追加食物失败: {e}")
+            return False
+    
+    def _extend_food_similarity_matrix(self, new_names: List[str]) -> Optional[Tuple]:
+        """计算并入新增食物后的相似性数据，不修改实例状态
+
+        返回(食物名称, 名称到行号的映射, 食物向量, 转置向量, 相似性矩阵)；不满足增量条件时返回None。
+        已有食物只需计算与新增食物的相似度，再与原有的前K个合并重选；
+        新增食物与全部食物计算。代价为 O(N×M) 而非全量重建的 O(N²)。
+        """
+        matrix = self.food_similarity_matrix
+        if matrix is None or self._food_vectors is None or not self.tfidf_vectorizer:
+            return None
+        
+        n_old = self._food_vectors.shape[0]
+        top_k = FOOD_SIMILARITY_TOP_K
+        if n_old - 1 < top_k:  # 原矩阵每行不足K个，直接全量重建
+            return None
+        
+        old_indices = matrix.indices.reshape(n_old, top_k)
+        old_data = matrix.data.reshape(n_old, top_k)
+        new_vectors = self._transform_food_names(new_names)
+        
+        food_names = self._food_names + tuple(map(sys.intern, new_names))
+        food_name_rows = {**self._food_name_rows, **{name: n_old + i for i, name in enumerate(food_names[n_old:])}}
+        food_vectors = sparse.vstack([self._food_vectors, new_vectors], format='csr')
+        food_vectors_t = food_vectors.T.tocsr()
+        n_foods = len(food_names)
+        
+        indices = np.empty((n_foods, top_k), dtype=np.int32)
+        data = np.empty((n_foods, top_k), dtype=np.float32)
+        
+        # 已有食物：原有的前K个与新增食物的相似度合并后重新取前K个
+        new_vectors_t = new_vectors.T.tocsr()
+        new_columns = np.arange(n_old, n_foods, dtype=np.int32)
+        for start in range(0, n_old, SIMILARITY_BLOCK_ROWS):
+            stop = min(start + SIMILARITY_BLOCK_ROWS, n_old)
+            new_scores = (food_vectors[start:stop] @ new_vectors_t).toarray()
+            candidate_indices = np.hstack([old_indices[start:stop], np.broadcast_to(new_columns, new_scores.shape)])
+            candidate_scores = np.hstack([old_data[start:stop], new_scores])
+            indices[start:stop], data[start:stop] = self._select_top_k(candidate_indices, candidate_scores, top_k)
+        
+        # 新增食物：与全部食物计算
+        indices[n_old:], data[n_old:] = self._top_k_similarities_cpu(top_k, start_row=n_old,
+                                                                     food_vectors=food_vectors,
+                                                                     food_vectors_t=food_vectors_t)
+        
+        indptr = np.arange(n_foods + 1, dtype=np.int32) * top_k
+        similarity_matrix = sparse.csr_matrix(
+            (data.ravel(), indices.ravel(), indptr), shape=(n_foods, n_foods)
+        )
+        return food_names, food_name_rows, food_vectors, food_vectors_t, similarity_matrix
+    
+    def _set_food_vectors(self, food_vectors: sparse.csr_matrix):
+        """设置食物向量，并一次性准备转置的CSR副本
+
+        CSR乘以转置视图（CSC）时scipy每次都会先把右侧转换为CSR，分块计算会重复转换。
+        """
+        self._food_vectors = food_vectors
+        self._food_vectors_t = food_vectors.T.tocsr()
+    
+    def _top_k_similarities_cpu(self, top_k: int, start_row: int = 0,
+                                food_vectors: Optional[sparse.csr_matrix] = None,
+                                food_vectors_t: Optional[sparse.csr_matrix] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """计算第start_row行起每个食物的前top_k个相似食物
+
+        默认使用当前的食物向量，增量更新时可传入尚未生效的向量。
+        返回(列号, 相似度)两个 (N-start_row)×K 数组，每行按相似度降序。
+        """
+        if food_vectors is None:
+            food_vectors, food_vectors_t = self._food_vectors, self._food_vectors_t
+        n_foods = food_vectors.shape[0]
+        indices = np.empty((n_foods - start_row, top_k), dtype=np.int32)
+        data = np.empty((n_foods - start_row, top_k), dtype=np.float32)
+        
+        # 按行分块计算相似度，峰值内存为 SIMILARITY_BLOCK_ROWS×N 而非 N×N；行号与self._food_name_rows一致
+        for start in range(start_row, n_foods if top_k > 0 else start_row, SIMILARITY_BLOCK_ROWS):
+            stop = min(start + SIMILARITY_BLOCK_ROWS, n_foods)
+            block = (food_vectors[start:stop] @ food_vectors_t).toarray()
+            rows = np.arange(stop - start)
+            block[rows, rows + start] = -np.inf  # 排除食物自身
+            
+            columns = np.broadcast_to(np.arange(n_foods, dtype=np.int32), block.shape)
+            top_indices, top_scores = self._select_top_k(columns, block, top_k)
+            indices[start - start_row:stop - start_row] = top_indices
+            data[start - start_row:stop - start_row] = top_scores
+        
+        return indices, data
+    
+    @staticmethod
+    def _select_top_k(candidate_indices: np.ndarray, candidate_scores: np.ndarray,
+                      top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """从每行候选中选出得分最高的top_k个：一次argpartition取前K个，再只对这K个稳定排序"""
+        top = np.argpartition(-candidate_scores, top_k - 1, axis=1)[:, :top_k]
+        top_scores = np.take_along_axis(candidate_scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        return (np.take_along_axis(candidate_indices, top, axis=1),
+                np.take_along_axis(top_scores, order, axis=1))
+    
+    def _top_k_similarities_gpu(self, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """在GPU上执行与CPU相同的分块top-K计算，只把N×K的结果拷回主机"""
+        vectors = cupy_sparse.csr_matrix(self._food_vectors)
+        vectors_t = vectors.T.tocsr()
+        n_foods = vectors.shape[0]
+        indices = cupy.empty((n_foods, top_k), dtype=cupy.int32)
+        data = cupy.empty((n_foods, top_k), dtype=cupy.float32)
+        
+        for start in range(0, n_foods, SIMILARITY_BLOCK_ROWS):
+            stop = min(start + SIMILARITY_BLOCK_ROWS, n_foods)
+            block = (vectors[start:stop] @ vectors_t).toarray()
+            rows = cupy.arange(stop - start)
+            block[rows, rows + start] = -cupy.inf  # 排除食物自身
+            
+            top_indices = cupy.argpartition(-block, top_k - 1, axis=1)[:, :top_k]
+            top_scores = cupy.take_along_axis(block, top_indices, axis=1)
+            order = cupy.argsort(-top_scores, axis=1)  # CuPy的排序本身是稳定的
+            indices[start:stop] = cupy.take_along_axis(top_indices, order, axis=1)
+            data[start:stop] = cupy.take_along_axis(top_scores, order, axis=1)
+        
+        return cupy.asnumpy(indices), cupy.asnumpy(data)
+    
+    def _detect_gpu_similarity(self) -> bool:
+        """检测CuPy与CUDA设备是否可用于食物相似度计算"""
+        if cupy is None:
+            return False
+        
+        try:
+            if cupy.cuda.runtime.getDeviceCount() <= 0:
+                return False
+            self.logger.info("检测到CUDA设备，大规模食物相似度将使用GPU计算")
+            return True
+        except Exception as e:
+            self.logger.warning(f"GPU相似度计算不可用: {e}")
+            return False
+    
+    def _food_similarity_fingerprint(self, food_names: List[str]) -> str:
+        """计算相似性矩阵的指纹：食物名称顺序、词表、IDF权重和归一化方式任一变化都会改变指纹"""
+        vectorizer = self.tfidf_vectorizer
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update("\x00".join(food_names).encode('utf-8'))
+        digest.update(b"\xff")
+        vocabulary = getattr(vectorizer, 'vocabulary_', {})
+        digest.update("\x00".join(f"{term}\x01{int(col)}" for term, col in sorted(vocabulary.items())).encode('utf-8'))
+        digest.update(b"\xff")
+        idf = getattr(vectorizer, 'idf_', None)
+        if idf is not None:
+            digest.update(np.ascontiguousarray(idf).tobytes())
+        digest.update(str(getattr(vectorizer, 'norm', None)).encode('utf-8'))
+        return digest.hexdigest()
+    
+    def _load_food_similarity_cache(self, fingerprint: str) -> bool:
+        """指纹匹配时从磁盘加载相似性矩阵和食物向量，返回是否加载成功"""
+        cache_path = self.model_path / 'food_similarity.pkl'
+        if not cache_path.exists():
+            return False
+        
+        try:
+            cached = joblib.load(cache_path, mmap_mode='r')
+            if cached.get('fingerprint') != fingerprint:
+                return False
+            
+            self._set_food_vectors(cached['food_vectors'])
+            self.food_similarity_matrix = cached['similarity_matrix']
+            return True
+            
+        except Exception as e:
+            self.logger.warning(f"相似性矩阵缓存读取失败，将重新构建: {e}")
+            return False
+    
+    def _save_food_similarity_cache(self, fingerprint: str):
+        """将相似性矩阵和食物向量连同指纹写入磁盘"""
+        try:
+            self._dump_model(
+                {
+                    'fingerprint': fingerprint,
+                    'food_vectors': self._food_vectors,
+                    'similarity_matrix': self.food_similarity_matrix
+                },
+                self.model_path / 'food_similarity.pkl'
+            )
+        except Exception as e:
+            self.logger.warning(f"相似性矩阵缓存保存失败: {e}")
+    
+    @staticmethod
+    def _dump_model(obj: Any, path: Path):
+        """以最高pickle协议、不压缩地保存模型，便于加载时用mmap_mode='r'内存映射其中的数组
+
+        先写临时文件再原子替换：已映射旧文件的进程不会读到被截断的内容。
+        """
+        tmp_path = path.with_suffix(path.suffix + '.tmp')
+        joblib.dump(obj, tmp_path, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    
+    def _get_similar_foods(self, food_name: str, top_k: int = FOOD_SIMILARITY_TOP_K) -> List[Tuple[str, float]]:
+        """获取某食物的前top_k个相似食物（按相似度降序，只返回有共同片段的食物）
+
+        top_k不超过FOOD_SIMILARITY_TOP_K时直接读取相似性矩阵中预存的行，
+        否则由食物向量现算并缓存结果。
+        """
+        row = self._food_name_rows.get(food_name)
+        if row is None or self.food_similarity_matrix is None or top_k <= 0:
+            return []
+        
+        if top_k > FOOD_SIMILARITY_TOP_K:
+            return list(self._similar_foods_cache(row, top_k))
+        
+        matrix = self.food_similarity_matrix
+        start = matrix.indptr[row]
+        end = min(matrix.indptr[row + 1], start + top_k)
+        names = self._food_names
+        # 矩阵每行固定存K个，可能含相似度为0的食物，与_rank_similarities一样剔除
+        return [
+            (names[j], similarity)
+            for j, similarity in zip(matrix.indices[start:end].tolist(), matrix.data[start:end].tolist())
+            if similarity > 0
+        ]
+    
+    def _query_similar_foods(self, row: int, top_k: int) -> Tuple[Tuple[str, float], ...]:
+        """由食物向量计算第row个食物的前top_k个相似食物（结果经_similar_foods_cache缓存）"""
+        similarities = (self._food_vectors[row] @ self._food_vectors_t).toarray().ravel()
+        similarities[row] = -np.inf  # 排除食物自身
+        return tuple(self._rank_similarities(similarities, min(top_k, len(similarities) - 1)))
+    
+    def _query_similar_by_text(self, text: str, top_k: int = FOOD_SIMILARITY_TOP_K) -> List[Tuple[str, float]]:
+        """按任意文本（如数据库外的食物名称）检索相似食物，只返回有共同片段的食物
+
+        查询向量与归一化的食物向量做一次稀疏矩阵-向量乘积即得到全部余弦相似度。
+        """
+        if self._food_vectors is None or not self.tfidf_vectorizer or top_k <= 0:
+            return []
+        
+        query = self.tfidf_vectorizer.transform([text]).astype(np.float32, copy=False)
+        if getattr(self.tfidf_vectorizer, 'norm', None) != 'l2':
+            query = normalize(query)
+        similarities = (self._food_vectors @ query.T).toarray().ravel()
+        return self._rank_similarities(similarities, top_k)
+    
+    def _rank_similarities(self, similarities: np.ndarray, top_k: int) -> List[Tuple[str, float]]:
+        """从一行相似度中取前top_k个食物，按相似度降序返回(名称, 相似度)，相似度不大于0的食物不返回"""
+        top_k = min(top_k, int(np.count_nonzero(similarities > 0)))
+        if top_k <= 0:
+            return []
+        
+        top_indices = np.argpartition(-similarities, top_k - 1)[:top_k]
+        top_indices = top_indices[np.argsort(-similarities[top_indices], kind='stable')]
+        names = self._food_names
+        return [
+            (names[j], similarity)
+            for j, similarity in zip(top_indices.tolist(), similarities[top_indices].tolist())
+        ]
     
     def _initialize_default_models(self):
         """初始化默认模型"""
         try:
-            # 初始化TF-IDF向量化器
-            self.tfidf_vectorizer = TfidfVectorizer(
-                max_features=1000,
-                stop_words=None,  # 中文不需要英文停用词
-                ngram_range=(1, 2)
-            )
+            # 初始化TF-IDF向量化器：中文食物名称短且不含空格，按字切分1-2字的片段；
+            # 只出现在一个食物中的片段不会带来相似度，用min_df=2剔除
+            self.tfidf_vectorizer = self._create_tfidf_vectorizer(min_df=2)
             
             # 使用食物名称训练
             food_names = list(self.food_database.keys())
-            self.tfidf_vectorizer.fit(food_names)
+            try:
+                self.tfidf_vectorizer.fit(food_names)
+            except ValueError:
+                # 食物之间没有任何共同片段时min_df=2会剔除全部词表，退回保留全部片段
+                self.tfidf_vectorizer = self._create_tfidf_vectorizer(min_df=1)
+                self.tfidf_vectorizer.fit(food_names)
             
             # 保存模型
             tfidf_path = self.model_path / 'tfidf_vectorizer.pkl'
-            joblib.dump(self.tfidf_vectorizer, tfidf_path)
+            self._dump_model(self.tfidf_vectorizer, tfidf_path)
             
             self.logger.info("默认模型初始化完成")
             
         except Exception as e:
             self.logger.error(f"默认模型初始化失败: {e}")
     
+    @staticmethod
+    def _create_tfidf_vectorizer(min_df: int) -> TfidfVectorizer:
+        """创建食物名称的TF-IDF向量化器"""
+        return TfidfVectorizer(
+            max_features=1000,
+            analyzer='char',
+            ngram_range=(1, 2),
+            min_df=min_df,
+            sublinear_tf=True,
+            dtype=np.float32
+        )
+    
     def _find_similar_foods(self, input_data: Dict, user_data: UserData) -> Dict[str, Any]:
         """查找相似食物"""
         target_food = input_data.get('food', '')
+        top_k = int(input_data.get('top_k', FOOD_SIMILARITY_TOP_K))
         
-        if not target_food or not self.food_similarity_matrix:
+        if not target_food or self.food_similarity_matrix is None:
             return self._create_error_result("无法找到相似食物")
         
-        similar_foods = self.food_similarity_matrix.get(target_food, {})
+        # 数据库外的食物按名称文本检索
+        if target_food in self._food_name_rows:
+            similar_foods = self._get_similar_foods(target_food, top_k)
+        else:
+            similar_foods = self._query_similar_by_text(target_food, top_k)
         
         return {
             'success': True,
             'target_food': target_food,
-            'similar_foods': list(similar_foods.items()),
+            'similar_foods': similar_foods,
             'confidence': 0.8
         }
     
@@ -888,8 +1403,10 @@ class RecommendationEngine(BaseModule):
                     'current_samples': total_samples
                 }
             
-            # 重新训练模型
-            self._load_or_train_models()
+            # 重新训练模型：直接重新拟合向量化器（加载流程会复用已保存的旧模型）；
+            # 词表和IDF未变化时相似性矩阵按指纹命中缓存，不会重新计算
+            self._initialize_default_models()
+            self._build_food_similarity_matrix()
             
             return {
                 'success': True,
@@ -4,51 +4,27 @@
 
 import sys
 import os
-from pathlib import Path
+from importlib.util import find_spec
 
 # 添加项目根目录到Python路径
-project_root = Path(__file__).parent
-sys.path.insert(0, str(project_root))
+# 直接运行脚本时sys.path[0]已是该目录，避免重复加入导致每次导入多查找一项
+project_root = os.path.dirname(os.path.abspath(__file__))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
 
-def check_dependencies():
-    """检查依赖包"""
-    required_packages = [
-        ('customtkinter', 'customtkinter'),
-        ('openai', 'openai'),
-        ('anthropic', 'anthropic'),
-        ('sklearn', 'scikit-learn'),
-        ('pandas', 'pandas'),
-        ('numpy', 'numpy'),
-        ('dotenv', 'python-dotenv')
-    ]
-    
-    missing_packages = []
-    
-    for import_name, package_name in required_packages:
-        try:
-            __import__(import_name)
-        except ImportError:
-            missing_packages.append(package_name)
-    
-    if missing_packages:
-        print("❌ 缺少以下依赖包:")
-        for package in missing_packages:
-            print(f"   - {package}")
-        print("\n请运行以下命令安装:")
-        print(f"pip install {' '.join(missing_packages)}")
-        return False
-    
-    print("✅ 所有依赖包已安装")
-    return True
+# 启动所需的依赖包：(导入名, pip包名)
+REQUIRED_PACKAGES = (
+    ('customtkinter', 'customtkinter'),
+    ('openai', 'openai'),
+    ('anthropic', 'anthropic'),
+    ('sklearn', 'scikit-learn'),
+    ('pandas', 'pandas'),
+    ('numpy', 'numpy'),
+    ('dotenv', 'python-dotenv')
+)
 
-def check_config():
-    """检查配置文件"""
-    env_file = Path('.env')
-    if not env_file.exists():
-        print("⚠️  配置文件 .env 不存在")
-        print("正在创建示例配置文件...")
-        
-        env_content = """# 个性化饮食推荐助手配置文件
+# 示例配置文件内容（.env不存在时写入）
+ENV_TEMPLATE = """# 个性化饮食推荐助手配置文件
 
 # 数据库配置
 DATABASE_URL=sqlite:///./data/app.db
@@ -81,12 +57,43 @@ THEME=dark
 DEBUG=true
 LOG_LEVEL=INFO
 """
+
+def check_dependencies():
+    """检查依赖包"""
+    missing_packages = []
+    
+    # 只查找模块位置而不执行导入，避免启动检查就加载整套重量级依赖
+    for import_name, package_name in REQUIRED_PACKAGES:
+        if find_spec(import_name) is None:
+            missing_packages.append(package_name)
+    
+    if missing_packages:
+        # 多行提示合并为一次输出
+        lines = ["❌ 缺少以下依赖包:"]
+        lines.extend(f"   - {package}" for package in missing_packages)
+        lines.append("\n请运行以下命令安装:")
+        lines.append(f"pip install {' '.join(missing_packages)}")
+        print("\n".join(lines))
+        return False
+    
+    print("✅ 所有依赖包已安装")
+    return True
+
+def check_config():
+    """检查配置文件"""
+    # O_EXCL保证只在文件不存在时创建，存在性检查与创建一步完成（权限600，文件中会保存API密钥）
+    try:
+        fd = os.open('.env', os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        fd = None
+    
+    if fd is not None:
+        print("⚠️  配置文件 .env 不存在\n正在创建示例配置文件...")
         
-        with open('.env', 'w', encoding='utf-8') as f:
-            f.write(env_content)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(ENV_TEMPLATE.encode('utf-8'))
         
-        print("✅ 示例配置文件已创建: .env")
-        print("💡 提示: 如需使用大模型功能，请在 .env 文件中配置API密钥")
+        print("✅ 示例配置文件已创建: .env\n💡 提示: 如需使用大模型功能，请在 .env 文件中配置API密钥")
     else:
         print("✅ 配置文件存在")
     
@@ -94,6 +101,7 @@ LOG_LEVEL=INFO
 
 def create_directories():
     """创建必要的目录"""
+    # 父目录排在子目录之前，每个目录只需一次mkdir调用
     directories = [
         'data',
         'data/users',
@@ -104,14 +112,20 @@ def create_directories():
     ]
     
     for directory in directories:
-        Path(directory).mkdir(parents=True, exist_ok=True)
+        try:
+            os.mkdir(directory)
+        except FileExistsError:
+            # 同名的普通文件会让后续写入失败，在这里直接报告
+            if not os.path.isdir(directory):
+                print(f"❌ 无法创建目录 {directory}：已存在同名文件，请移除后重试")
+                return False
     
     print("✅ 目录结构创建完成")
+    return True
 
 def main():
     """主函数"""
-    print("🍎 个性化饮食推荐助手 - 启动检查")
-    print("=" * 50)
+    print("🍎 个性化饮食推荐助手 - 启动检查\n" + "=" * 50)
     
     # 检查依赖
     if not check_dependencies():
@@ -122,20 +136,23 @@ def main():
         return False
     
     # 创建目录
-    create_directories()
+    if not create_directories():
+        return False
     
-    print("\n🚀 启动应用...")
-    print("=" * 50)
+    print("\n🚀 启动应用...\n" + "=" * 50)
     
     try:
-        # 导入并运行主应用
+        # 导入主应用；缺少未列入检查的依赖时给出明确提示
         from main import main as run_app
+    except ImportError as e:
+        print(f"\n❌ 应用启动失败，无法导入模块: {e.name or e}")
+        return False
+    
+    try:
+        # 运行主应用，其他异常交给解释器打印完整回溯
         run_app()
     except KeyboardInterrupt:
         print("\n👋 用户中断，应用退出")
-    except Exception as e:
-        print(f"\n❌ 应用启动失败: {e}")
-        return False
     
     return True
 